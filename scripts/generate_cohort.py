@@ -1,7 +1,8 @@
 from argparse import ArgumentParser
 from pathlib import Path
 
-from pandas import DataFrame, Series
+from numpy.random import default_rng
+from pandas import DataFrame
 
 from rwdsim.cfgutils import SimParams, read_config
 from rwdsim.simulation import run_simulation
@@ -10,14 +11,13 @@ arg_parser: ArgumentParser = ArgumentParser(description='Simulate a cohort and s
 
 arg_parser.add_argument('simconfig', type=Path, help='path to the configuration file')
 arg_parser.add_argument('output', type=Path, help='path to the output csv file')
+arg_parser.add_argument('--seed', type=int, help='the seed of the random generator, for a reproducible cohort')
 
 args = arg_parser.parse_args()
 
-sim_params: SimParams
-with open(args.simconfig) as cfg_file:
-    sim_params = read_config(cfg_file)
+sim_params: SimParams = read_config(args.simconfig)
 
-data: DataFrame | Series = run_simulation(sim_params)
+data: DataFrame = run_simulation(sim_params, default_rng(args.seed)).to_dataframe()
 
 print(f'Saving output to {args.output}')
 with open(args.output, 'w') as out_file:
@@ -1,13 +1,20 @@
+import csv
 from argparse import ArgumentParser
+from collections.abc import Iterator
+from dataclasses import astuple, fields
 from datetime import date, timedelta
+from itertools import islice
+from math import isnan
 from pathlib import Path
 
-import pandas as pd
-from pandas import DataFrame, Timestamp
+import numpy as np
+import pyarrow as pa
+from pandas import Timestamp
+from pyarrow import csv as pa_csv
 
 from rwdsim.cfgutils import SimParams, read_config
-from rwdsim.classes import Patient, Report
-from rwdsim.reportutils import generate_report_for_drugs
+from rwdsim.classes import Drug, Patient, PatientArrays, Report
+from rwdsim.reportutils import ReportData, generate_report_for_drugs, generate_reports_for_drugs, prepare_report_data
 from rwdsim.simulation import run_simulation
 
 arg_parser: ArgumentParser = ArgumentParser(
@@ -28,68 +35,103 @@ arg_parser.add_argument(
 )
 
 args = arg_parser.parse_args()
-with open(args.simconfig) as cfg_file:
-    sim_params: SimParams = read_config(cfg_file)
+sim_params: SimParams = read_config(args.simconfig)
 
-data: DataFrame
+cohort: PatientArrays
 
 if args.cohort:
-    data = pd.read_csv(  # pyright: ignore [reportUnknownMemberType]
-        args.cohort,
-        parse_dates=[
-            key for key in Patient.__annotations__ if Patient.__annotations__[key] in [Timestamp, Timestamp | None]
-        ],
-        date_format='%Y-%m-%d',
+    # read the cohort with the arrow csv reader, parsing the date columns to timestamps in bulk
+    date_columns: list[str] = [
+        key for key in Patient.__annotations__ if Patient.__annotations__[key] in [Timestamp, Timestamp | None]
+    ]
+    cohort = PatientArrays.from_dataframe(
+        pa_csv.read_csv(  # pyright: ignore [reportUnknownMemberType, reportUnknownArgumentType]
+            args.cohort,
+            convert_options=pa_csv.ConvertOptions(  # pyright: ignore [reportUnknownMemberType]
+                column_types={'drug': pa.dictionary(pa.int32(), pa.string())}  # pyright: ignore [reportUnknownMemberType]
+                | {column: pa.timestamp('ns') for column in date_columns},  # pyright: ignore [reportUnknownMemberType]
+                timestamp_parsers=['%Y-%m-%d'],
+            ),
+        ).to_pandas(),
+        sim_params.drugs,
     )
 else:
-    data = run_simulation(sim_params)
-
-# the output reports
-reports: list[Report] = []
-
-# whole cohort
-print('Generating report for whole cohort')
-reports.append(
-    generate_report_for_drugs(
-        data,
-        sim_params.study_start_date + timedelta(days=7 * 52 * 15),
-        {drug.name for drug in sim_params.drugs},
-        'Whole Cohort',
-    )
-)
+    cohort = run_simulation(sim_params)
+
+# prepare the drug masks and date columns of the cohort once for all reports
+report_data: ReportData = prepare_report_data(cohort)
+
+
+def report_row(report: Report) -> list[object]:
+    # missing values are written as empty fields, the same way DataFrame.to_csv writes NaN
+    return ['' if isinstance(value, float) and isnan(value) else value for value in astuple(report)]
+
+
+# the summary report date and the drug name selections are the same for all reports
+summary_report_date: date = sim_params.study_start_date + timedelta(days=7 * 52 * 15)
+all_drug_names: frozenset[str] = frozenset(drug.name for drug in sim_params.drugs)
+drug_names: dict[str, frozenset[str]] = {drug.name: frozenset((drug.name,)) for drug in sim_params.drugs}
+
+# the number of report dates per drug computed together, the reports stop at the first unchanged one when unbounded
+REPORT_BATCH_SIZE: int = 64
 
-# summary for each drug
-for drug in sim_params.drugs:
-    print(f'Generating report for {drug.name}')
-    reports.append(
-        generate_report_for_drugs(
-            data,
-            sim_params.study_start_date + timedelta(days=7 * 52 * 15),
-            {
-                drug.name,
-            },
-            drug.name,
+
+def drug_reports(drug: Drug) -> Iterator[tuple[date, Report]]:
+    # the reports for the drug every frequency days from the study start, generated in batches of report dates, the
+    # batches are not larger than the number of reports requested
+    batch_size: int = min(args.report_count, REPORT_BATCH_SIZE) if args.report_count else REPORT_BATCH_SIZE
+    report_offsets = np.arange(batch_size) * np.timedelta64(args.frequency, 'D')
+    batch_start = np.datetime64(sim_params.study_start_date, 'D')
+    while True:
+        report_dates = batch_start + report_offsets
+        report_date_list: list[date] = report_dates.tolist()
+        report_names: list[str] = [f'{drug.name}: {report_date}' for report_date in report_date_list]
+        yield from zip(
+            report_date_list,
+            generate_reports_for_drugs(report_data, report_dates, drug_names[drug.name], report_names),
+            strict=True,
+        )
+        batch_start += batch_size * np.timedelta64(args.frequency, 'D')
+
+
+# the reports are written to the output file as they are generated
+with open(args.output, 'w') as out_file:
+    report_writer = csv.writer(out_file, lineterminator='\n')
+    report_writer.writerow(field.name for field in fields(Report))
+
+    # whole cohort
+    print('Generating report for whole cohort')
+    report_writer.writerow(
+        report_row(
+            generate_report_for_drugs(
+                report_data,
+                summary_report_date,
+                all_drug_names,
+                'Whole Cohort',
+            )
         )
     )
 
-# yearly reports per drug
-for drug in sim_params.drugs:
-    last_report: Report | None = None
-    report_date: date = sim_params.study_start_date
-    report_count: int = 0
-    report = generate_report_for_drugs(data, report_date, {drug.name}, f'{drug.name}: {report_date}')
-    while (
-        args.report_count
-        and report_count < args.report_count
-        or not args.report_count
-        and not report.data_equals(last_report)
-    ):
-        print(f'Generating report for {drug.name}, on {report_date}')
-        reports.append(report)
-        last_report = report
-        report_date += timedelta(days=args.frequency)
-        report_count += 1
-        report = generate_report_for_drugs(data, report_date, {drug.name}, f'{drug.name}: {report_date}')
-
-reports_df: DataFrame = DataFrame(reports)
-reports_df.to_csv(args.output, index=False)
+    # summary for each drug
+    for drug in sim_params.drugs:
+        print(f'Generating report for {drug.name}')
+        report_writer.writerow(
+            report_row(
+                generate_report_for_drugs(
+                    report_data,
+                    summary_report_date,
+                    drug_names[drug.name],
+                    drug.name,
+                )
+            )
+        )
+
+    # yearly reports per drug
+    for drug in sim_params.drugs:
+        last_report: Report | None = None
+        for report_date, report in islice(drug_reports(drug), args.report_count or None):
+            if not args.report_count and report.data_equals(last_report):
+                break
+            print(f'Generating report for {drug.name}, on {report_date}')
+            report_writer.writerow(report_row(report))
+            last_report = report
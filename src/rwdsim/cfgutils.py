@@ -1,16 +1,30 @@
-from io import TextIOWrapper
+import os
+from functools import lru_cache
+from pathlib import Path
+from typing import IO
 
 from .classes import SimParams
 
 
-def read_config(config_file: TextIOWrapper) -> SimParams:
+def read_config(config_file: IO[str] | IO[bytes] | str | os.PathLike[str]) -> SimParams:
     """Reads simulation parameters from a configuration file and populates the SimParams named tuple.
+    Configurations read by path are cached until the file is modified.
 
     Args:
-        config_file_path (str): Path to the configuration file.
+        config_file (IO | str | PathLike): The configuration file opened in text or binary mode, or the path to it.
 
     Returns:
         SimParams: A named tuple containing all simulation parameters.
     """
-    params: SimParams = SimParams.model_validate_json(''.join(config_file.readlines()))
+    if isinstance(config_file, str | os.PathLike):
+        config_path: str = os.fspath(config_file)
+        return _read_config_cached(config_path, os.path.getmtime(config_path))
+
+    params: SimParams = SimParams.model_validate_json(config_file.read())
     return params
+
+
+@lru_cache(maxsize=16)
+def _read_config_cached(config_path: str, mtime: float) -> SimParams:
+    # the modification time is part of the cache key, so that a changed file is read again
+    return SimParams.model_validate_json(Path(config_path).read_bytes())
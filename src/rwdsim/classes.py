@@ -1,10 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, fields
 from datetime import date
 from enum import StrEnum
+from functools import cached_property
+from typing import Any
 
-from pandas import Timestamp
-from pydantic import BaseModel
-from pydantic_settings import BaseSettings
+import numpy as np
+from pandas import Categorical, DataFrame, Timestamp
+from pydantic import BaseModel, field_validator
+from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
 class Drug(BaseModel, extra='forbid', frozen=True):
@@ -13,6 +16,21 @@ class Drug(BaseModel, extra='forbid', frozen=True):
     start_date_range: tuple[int, int]
     probability_weights: tuple[int, ...]
 
+    @field_validator('survival_probabilities')
+    @classmethod
+    def _validate_survival_probabilities(cls, survival_probabilities: dict[int, float]) -> dict[int, float]:
+        # validate the survival probabilities once and keep them sorted by year, the order they are interpolated in
+        if not survival_probabilities:
+            raise ValueError('At least one survival probability has to be configured.')
+        if not all(0 <= probability <= 1 for probability in survival_probabilities.values()):
+            raise ValueError('Survival probabilities must be between 0 and 1.')
+        return dict(sorted(survival_probabilities.items()))
+
+    @cached_property
+    def survival_curve(self) -> tuple[tuple[int, ...], tuple[float, ...]]:
+        """The years and survival probabilities sorted by year, converted once per drug instead of per patient."""
+        return tuple(self.survival_probabilities), tuple(self.survival_probabilities.values())
+
     def __str__(self) -> str:
         return self.name
 
@@ -36,7 +54,99 @@ class Patient:
     death_date_abstracted: Timestamp | None
 
 
-@dataclass
+BoolArray = np.ndarray[Any, np.dtype[np.bool_]]
+DateArray = np.ndarray[Any, np.dtype[np.datetime64]]
+
+# the Patient fields holding event dates, in the order of their declaration
+_PATIENT_DATE_FIELDS: tuple[str, ...] = tuple(field.name for field in fields(Patient))[2:]
+
+
+@dataclass(slots=True, frozen=True)
+class PatientArrays:
+    """The patient cohort stored column-wise, one array per Patient field.
+    The dates are datetime64[D] arrays with NaT for missing dates, the drugs are stored as their index in drugs.
+    """
+
+    drugs: tuple[Drug, ...]
+    patient_id: np.ndarray[Any, np.dtype[np.int64]]
+    drug_codes: np.ndarray[Any, np.dtype[np.int16]]
+
+    diagnosis_date: DateArray
+    diagnosis_date_exported: DateArray
+    diagnosis_date_abstracted: DateArray
+
+    drug_date: DateArray
+    drug_date_exported: DateArray
+    drug_date_abstracted: DateArray
+
+    death_date: DateArray
+    death_date_recorded: DateArray
+    death_date_exported: DateArray
+    death_date_abstracted: DateArray
+
+    def __len__(self) -> int:
+        return len(self.patient_id)
+
+    @classmethod
+    def from_dataframe(cls, data: DataFrame, drugs: tuple[Drug, ...]) -> 'PatientArrays':
+        """Stores a cohort read into a DataFrame column-wise, drugs not in the given drugs get the code -1."""
+        drug_codes = np.asarray(
+            Categorical(data['drug'], categories=[drug.name for drug in drugs]).codes,  # pyright: ignore [reportUnknownMemberType, reportUnknownArgumentType]
+            dtype=np.int16,
+        )
+        dates: dict[str, DateArray] = {
+            column: np.asarray(data[column], dtype='datetime64[D]') for column in _PATIENT_DATE_FIELDS
+        }
+        return cls(
+            drugs=drugs,
+            patient_id=np.asarray(data['patient_id'], dtype=np.int64),
+            drug_codes=drug_codes,
+            **dates,
+        )
+
+    def take(self, indices: np.ndarray[Any, np.dtype[np.intp]]) -> 'PatientArrays':
+        """Returns the patients at the indices, in the order of the indices."""
+        return PatientArrays(
+            drugs=self.drugs,
+            patient_id=self.patient_id[indices],
+            drug_codes=self.drug_codes[indices],
+            **{column: getattr(self, column)[indices] for column in _PATIENT_DATE_FIELDS},
+        )
+
+    def to_dataframe(self) -> DataFrame:
+        """Returns the cohort as a DataFrame with a column per Patient field, the drugs by name as categories."""
+        return DataFrame(
+            {
+                'patient_id': self.patient_id,
+                'drug': Categorical.from_codes(  # pyright: ignore [reportUnknownMemberType]
+                    self.drug_codes,  # pyright: ignore [reportArgumentType]
+                    categories=[drug.name for drug in self.drugs],  # pyright: ignore [reportArgumentType]
+                ),
+            }
+            | {column: getattr(self, column).astype('datetime64[ns]') for column in _PATIENT_DATE_FIELDS}
+        )
+
+    def view(self, index: int) -> Patient:
+        """Returns the patient at the index as a Patient record, meant for inspecting single patients.
+
+        Raises:
+            ValueError: If the patient's drug is not one of the drugs, as read by from_dataframe.
+        """
+        drug_code = int(self.drug_codes[index])
+        if drug_code < 0:
+            raise ValueError(f'The drug of patient {self.patient_id[index]} is not one of the configured drugs.')
+        return Patient(
+            patient_id=int(self.patient_id[index]),
+            drug=self.drugs[drug_code],
+            diagnosis_date=Timestamp(self.diagnosis_date[index]),
+            **{
+                column: None if np.isnat(value := getattr(self, column)[index]) else Timestamp(value)
+                for column in _PATIENT_DATE_FIELDS[1:]
+            },
+        )
+
+
+@dataclass(slots=True, frozen=True)
 class Report:
     name: str
     num_patients: int
@@ -52,20 +162,25 @@ class Report:
         if other is None:
             return False
 
-        _name = self.name
-        _other_name = other.name
-        self.name = ''
-        other.name = ''
-
-        eq: bool = self == other
+        # compare all fields but the name, the same way the dataclass __eq__ compares field tuples
+        return self._data() == other._data()
 
-        self.name = _name
-        other.name = _other_name
-
-        return eq
+    def _data(self) -> tuple[int, float, float, float, float, float, float, float]:
+        return (
+            self.num_patients,
+            self.dx_db_delta_days,
+            self.tx_db_delta_days,
+            self.tx_abst_delta_days,
+            self.db_abst_delta_days,
+            self.treated_drug_fraction,
+            self.treated_total_fraction,
+            self.survival_fraction,
+        )
 
 
 class SimParams(BaseSettings):
+    model_config = SettingsConfigDict(frozen=True)
+
     observation_start_date: date
     observation_end_date: date
     study_start_date: date
@@ -1,109 +1,266 @@
-from datetime import date, timedelta
-from typing import cast
-
-from numpy import NAN
-from pandas import DataFrame, Series
-
-from .classes import Report
-
-
-def generate_report_for_drugs(data: DataFrame, report_date: date, drugs: set[str], report_name: str) -> Report:
-    num_patients = get_num_patients(data, report_date, drugs)
-    return Report(
-        name=report_name,
-        num_patients=num_patients,
-        dx_db_delta_days=round(
-            get_avg_delta_time(
-                data,
-                report_date,
-                drugs,
-                'diagnosis_date',
-                'diagnosis_date_exported',
-            ),
-            2,
-        ),
-        tx_db_delta_days=round(
-            get_avg_delta_time(
-                data,
-                report_date,
-                drugs,
-                'drug_date',
-                'drug_date_exported',
-            ),
-            2,
-        ),
-        tx_abst_delta_days=round(
-            get_avg_delta_time(
-                data,
-                report_date,
-                drugs,
-                'drug_date',
-                'drug_date_abstracted',
-            ),
-            2,
-        ),
-        db_abst_delta_days=round(
-            get_avg_delta_time(
-                data,
-                report_date,
-                drugs,
-                'drug_date_exported',
-                'drug_date_abstracted',
-            ),
-            2,
-        ),
-        treated_drug_fraction=round(get_treated(data, report_date, drugs) / num_patients, 2)
-        if num_patients != 0
-        else NAN,
-        treated_total_fraction=round(
-            get_treated(data, report_date, drugs) / get_num_patients_total(data, report_date), 2
+from collections.abc import Sequence
+from collections.abc import Set as AbstractSet
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any
+
+import numpy as np
+
+from .classes import BoolArray, DateArray, PatientArrays, Report
+
+DayArray = np.ndarray[Any, np.dtype[np.int64]]
+
+# the column holding the date a patient's diagnosis was abstracted, which gates the patient into the reports
+_DX_COL = 'diagnosis_date_abstracted'
+# the date columns the reports are calculated from
+_DATE_COLS = (
+    'diagnosis_date',
+    'diagnosis_date_exported',
+    _DX_COL,
+    'drug_date',
+    'drug_date_exported',
+    'drug_date_abstracted',
+    'death_date_abstracted',
+)
+# the day number of missing dates, NaT, and the day number they are stored as in the prepared report data
+_NAT_DAYS = np.datetime64('NaT', 'D').view(np.int64)
+_NEVER = np.iinfo(np.int64).max
+# the date pairs of the average delta statistics, in the order of the Report fields
+_DELTA_PAIRS = (
+    ('diagnosis_date', 'diagnosis_date_exported'),
+    ('drug_date', 'drug_date_exported'),
+    ('drug_date', 'drug_date_abstracted'),
+    ('drug_date_exported', 'drug_date_abstracted'),
+)
+
+
+@dataclass(slots=True, frozen=True)
+class _ReportTimeline:
+    # The days from which each selected patient counts towards a report statistic, sorted so that the count on a
+    # report date is the insertion point of its cutoff. A patient counts towards a delta statistic once both dates
+    # are before the cutoff, the running sums of the deltas in the same order give the sum up to the cutoff.
+    abstracted: DayArray
+    treated: DayArray
+    deaths: DayArray
+    deltas: tuple[tuple[DayArray, DayArray], ...]
+
+
+@dataclass(slots=True, frozen=True)
+class ReportData:
+    """The cohort columns used by the reports, prepared once as numpy arrays.
+    The patients are sorted by their abstracted diagnosis date, patients without one come last.
+    """
+
+    drug_names: tuple[str, ...]
+    drug_codes: np.ndarray[Any, np.dtype[np.signedinteger[Any]]]
+    dates: dict[str, DayArray]
+    _selections: dict[frozenset[str], BoolArray] = field(default_factory=dict, init=False, repr=False)
+    _timelines: dict[frozenset[str], _ReportTimeline] = field(default_factory=dict, init=False, repr=False)
+
+    def select(self, drugs: AbstractSet[str]) -> BoolArray:
+        """Returns the read-only mask of the patients receiving any of the given drugs."""
+        # the selections are kept per drug set, frozen as a plain set cannot be used as a key
+        drugs = frozenset(drugs)
+        selected = self._selections.get(drugs)
+        if selected is None:
+            # compare the integer drug codes, a single code without a hash lookup per patient
+            codes = [code for code, name in enumerate(self.drug_names) if name in drugs]
+            selected = self.drug_codes == codes[0] if len(codes) == 1 else np.isin(self.drug_codes, codes)
+            selected.flags.writeable = False
+            self._selections[drugs] = selected
+        return selected
+
+    def timeline(self, drugs: AbstractSet[str]) -> _ReportTimeline:
+        """Returns the sorted days from which the patients receiving any of the given drugs count towards the
+        report statistics, the same for all report dates.
+        """
+        drugs = frozenset(drugs)
+        timeline = self._timelines.get(drugs)
+        if timeline is None:
+            dates = {column: days[self.select(drugs)] for column, days in self.dates.items()}
+            deltas: list[tuple[DayArray, DayArray]] = []
+            for event_a, event_b in _DELTA_PAIRS:
+                days = np.maximum(dates[event_a], dates[event_b])
+                order = np.argsort(days, kind='stable')
+                delta_days = np.zeros_like(days)
+                # patients missing either date never count, their delta is left out instead of overflowing
+                np.subtract(dates[event_b], dates[event_a], out=delta_days, where=days != _NEVER)
+                deltas.append((days[order], np.concatenate(([0], np.cumsum(delta_days[order])))))
+            timeline = _ReportTimeline(
+                abstracted=dates[_DX_COL],
+                treated=np.sort(dates['drug_date_abstracted']),
+                deaths=np.sort(np.maximum(dates[_DX_COL], dates['death_date_abstracted'])),
+                deltas=tuple(deltas),
+            )
+            self._timelines[drugs] = timeline
+        return timeline
+
+
+def prepare_report_data(cohort: PatientArrays) -> ReportData:
+    """Prepares the cohort for generating reports from it.
+
+    Args:
+        cohort (PatientArrays): The patient cohort.
+
+    Returns:
+        ReportData: The drug codes and date columns of the cohort sorted by the abstracted diagnosis date.
+    """
+    dates: dict[str, DayArray] = {column: _to_days(getattr(cohort, column)) for column in _DATE_COLS}
+    order = np.argsort(dates[_DX_COL], kind='stable')
+    return ReportData(
+        drug_names=tuple(drug.name for drug in cohort.drugs),
+        drug_codes=cohort.drug_codes[order],
+        dates={column: days[order] for column, days in dates.items()},
+    )
+
+
+def _to_days(dates: DateArray) -> DayArray:
+    # the dates as days since the epoch, a missing date is never before any cutoff
+    days = dates.astype('datetime64[D]', copy=False).view(np.int64)
+    return np.where(days == _NAT_DAYS, _NEVER, days)
+
+
+def _to_day(report_date: date) -> int:
+    # the report date as days since the epoch, the cutoff the date columns are compared with
+    return int(np.datetime64(report_date, 'D').view(np.int64))
+
+
+def generate_report_for_drugs(
+    data: PatientArrays | ReportData, report_date: date, drugs: AbstractSet[str], report_name: str
+) -> Report:
+    """Generates the report for the given drugs as it would look on the report date.
+
+    Args:
+        data (PatientArrays | ReportData): The patient cohort, prepare it once when generating several reports.
+        report_date (date): The date of the report, only events abstracted before it are considered.
+        drugs (AbstractSet[str]): The names of the drugs to report on.
+        report_name (str): The name of the report.
+
+    Returns:
+        Report: The generated report.
+    """
+    # a single report is the series of one report date, so that all reports are computed the same way
+    return generate_reports_for_drugs(data, [report_date], drugs, [report_name])[0]
+
+
+def generate_reports_for_drugs(
+    data: PatientArrays | ReportData,
+    report_dates: Sequence[date] | DateArray,
+    drugs: AbstractSet[str],
+    report_names: Sequence[str],
+) -> list[Report]:
+    """Generates the reports for the given drugs as they would look on each of the report dates.
+    The reports are computed together, counting the patients before each report date in the sorted timeline of
+    the drugs instead of masking the cohort once per report date.
+
+    Args:
+        data (PatientArrays | ReportData): The patient cohort, prepare it once when generating several reports.
+        report_dates (Sequence[date] | DateArray): The dates of the reports, only events abstracted before each are
+            considered. A datetime64 array of the dates is used as the cutoffs without converting each date.
+        drugs (AbstractSet[str]): The names of the drugs to report on.
+        report_names (Sequence[str]): The names of the reports, one per report date.
+
+    Returns:
+        list[Report]: The generated reports in the order of the report dates.
+    """
+    if isinstance(data, PatientArrays):
+        data = prepare_report_data(data)
+
+    timeline = data.timeline(drugs)
+    cutoffs: DayArray = np.asarray(report_dates, dtype='datetime64[D]').view(np.int64)
+    # The statistics of all report dates are written into two preallocated buffers, a row per statistic, and are
+    # converted to python numbers once. Averages of report dates without valid patients stay NaN.
+    counts: DayArray = np.empty((4, len(cutoffs)), dtype=np.int64)
+    avg_delta_days = np.full((len(_DELTA_PAIRS), len(cutoffs)), np.nan)
+    counts[0] = np.searchsorted(data.dates[_DX_COL], cutoffs)
+    counts[1] = np.searchsorted(timeline.abstracted, cutoffs)
+    counts[2] = np.searchsorted(timeline.treated, cutoffs)
+    counts[3] = np.searchsorted(timeline.deaths, cutoffs)
+    for avg_delta, (days, delta_sums) in zip(avg_delta_days, timeline.deltas, strict=True):
+        num_valid = np.searchsorted(days, cutoffs)
+        np.divide(delta_sums[num_valid], num_valid, out=avg_delta, where=num_valid != 0)
+
+    num_patients_total, num_patients, num_treated, num_deaths = counts.tolist()
+    reports: list[Report] = []
+    for i, (report_name, avg_deltas) in enumerate(zip(report_names, avg_delta_days.T.tolist(), strict=True)):
+        dx_db_delta_days, tx_db_delta_days, tx_abst_delta_days, db_abst_delta_days = (
+            round(avg_delta, 2) for avg_delta in avg_deltas
+        )
+        treated_drug_fraction, treated_total_fraction, survival_fraction = _fractions(
+            num_patients[i], num_patients_total[i], num_treated[i], num_deaths[i]
+        )
+        reports.append(
+            Report(
+                name=report_name,
+                num_patients=num_patients[i],
+                dx_db_delta_days=dx_db_delta_days,
+                tx_db_delta_days=tx_db_delta_days,
+                tx_abst_delta_days=tx_abst_delta_days,
+                db_abst_delta_days=db_abst_delta_days,
+                treated_drug_fraction=treated_drug_fraction,
+                treated_total_fraction=treated_total_fraction,
+                survival_fraction=survival_fraction,
+            )
         )
-        if num_patients != 0
-        else NAN,
-        survival_fraction=round((num_patients - get_deaths(data, report_date, drugs)) / num_patients, 2)
-        if num_patients != 0
-        else NAN,
+    return reports
+
+
+def _fractions(
+    num_patients: int, num_patients_total: int, num_treated: int, num_deaths: int
+) -> tuple[float, float, float]:
+    # the treated drug, treated total and survival fractions of a report, not defined without patients
+    if num_patients == 0:
+        return np.nan, np.nan, np.nan
+    return (
+        round(num_treated / num_patients, 2),
+        round(num_treated / num_patients_total, 2),
+        round((num_patients - num_deaths) / num_patients, 2),
     )
 
 
-def get_num_patients(data: DataFrame, report_date: date, drugs: set[str]) -> int:
-    selected_drugs = data['drug'].astype(str).isin(drugs)  # pyright: ignore [reportUnknownMemberType]
-    diag_date_abstracted = data['diagnosis_date_abstracted'].dt.date < report_date
-    return len(data[selected_drugs & diag_date_abstracted])
+def _avg_delta_days(event_a: DayArray, event_b: DayArray, valid: BoolArray, out: DayArray) -> float:
+    # the mean number of days from event a to event b of the valid patients, subtracted into the out buffer
+    # in place and summed where valid, without gathering the valid patients into new arrays
+    num_valid = np.count_nonzero(valid)
+    if num_valid == 0:
+        return np.nan
+    np.subtract(event_b, event_a, out=out, where=valid)
+    return float(out.sum(where=valid) / num_valid)
+
+
+def get_num_patients(data: ReportData, report_date: date, drugs: AbstractSet[str]) -> int:
+    num_abstracted = get_num_patients_total(data, report_date)
+    return int(np.count_nonzero(data.select(drugs)[:num_abstracted]))
 
 
-def get_num_patients_total(data: DataFrame, report_date: date) -> int:
-    diag_date_abstracted = data['diagnosis_date_abstracted'].dt.date < report_date
-    return len(data[diag_date_abstracted])
+def get_num_patients_total(data: ReportData, report_date: date) -> int:
+    # the number of diagnoses abstracted before the report date is the insertion point of the report date
+    return int(np.searchsorted(data.dates[_DX_COL], _to_day(report_date), side='left'))
 
 
-def get_treated(data: DataFrame, report_date: date, drugs: set[str]) -> int:
-    selected_drugs = data['drug'].astype(str).isin(drugs)  # pyright: ignore [reportUnknownMemberType]
-    drug_abstracted = data['drug_date_abstracted'].dt.date < report_date
+def get_treated(data: ReportData, report_date: date, drugs: AbstractSet[str]) -> int:
+    drug_abstracted = data.dates['drug_date_abstracted'] < _to_day(report_date)
 
-    return len(data[selected_drugs & drug_abstracted])
+    return int(np.count_nonzero(data.select(drugs) & drug_abstracted))
 
 
-def get_untreated(data: DataFrame, report_date: date) -> int:
-    diag_date_abstracted = data['diagnosis_date_abstracted'].dt.date < report_date
-    drug_abstracted = data['drug_date_abstracted'].dt.date < report_date
+def get_untreated(data: ReportData, report_date: date) -> int:
+    num_abstracted = get_num_patients_total(data, report_date)
+    drug_abstracted = data.dates['drug_date_abstracted'][:num_abstracted] < _to_day(report_date)
 
-    return len(data.loc[diag_date_abstracted & ~drug_abstracted])
+    return num_abstracted - int(np.count_nonzero(drug_abstracted))
 
 
-def get_deaths(data: DataFrame, report_date: date, drugs: set[str]) -> int:
-    selected_drugs = data['drug'].astype(str).isin(drugs)  # pyright: ignore [reportUnknownMemberType]
-    diag_date_abstracted = data['diagnosis_date_abstracted'].dt.date < report_date
-    death_date_abstracted = data['death_date_abstracted'].dt.date < report_date
+def get_deaths(data: ReportData, report_date: date, drugs: AbstractSet[str]) -> int:
+    num_abstracted = get_num_patients_total(data, report_date)
+    death_date_abstracted = data.dates['death_date_abstracted'][:num_abstracted] < _to_day(report_date)
 
-    return len(data.loc[selected_drugs & diag_date_abstracted & death_date_abstracted])
+    return int(np.count_nonzero(data.select(drugs)[:num_abstracted] & death_date_abstracted))
 
 
-def get_avg_delta_time(data: DataFrame, report_date: date, drugs: set[str], event_a: str, event_b: str) -> float:
-    selected_drugs = data['drug'].astype(str).isin(drugs)  # pyright: ignore [reportUnknownMemberType]
-    event_a_avaliable = data[event_a].dt.date < report_date
-    event_b_avaliable = data[event_b].dt.date < report_date
-    valid_data = data[selected_drugs & event_a_avaliable & event_b_avaliable]
-    delta_dates: Series[timedelta] = valid_data[event_b] - valid_data[event_a]
-    delta_days: Series[float] = cast(Series, delta_dates / timedelta(days=1))  # pyright: ignore [reportOperatorIssue]
-    return delta_days.mean()  # pyright: ignore [reportUnknownMemberType]
+def get_avg_delta_time(
+    data: ReportData, report_date: date, drugs: AbstractSet[str], event_a: str, event_b: str
+) -> float:
+    cutoff = _to_day(report_date)
+    valid = data.select(drugs) & (data.dates[event_a] < cutoff) & (data.dates[event_b] < cutoff)
+    return _avg_delta_days(data.dates[event_a], data.dates[event_b], valid, np.empty_like(data.dates[event_a]))
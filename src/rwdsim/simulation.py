@@ -1,441 +1,468 @@
-import random
-from datetime import date, timedelta
+from collections.abc import Callable, Iterator
+from datetime import date
 from functools import cache
+from itertools import count
+from operator import attrgetter
+from typing import Any
 
-from dateutil.relativedelta import relativedelta
-from numpy import isnan
-from pandas import DataFrame, Timestamp
+import numpy as np
+from numpy.random import Generator, default_rng
 from scipy.interpolate import PchipInterpolator
 
 from rwdsim import simutils
 from rwdsim.cfgutils import SimParams
 
-from .classes import Patient
+from .classes import BoolArray, DateArray, Drug, PatientArrays
 
+# the number of survival probabilities the survival curves are tabulated at for drawing the survival years
+_SURVIVAL_TABLE_SIZE = 4096
 
-def calculate_min_max_event_date(patients: list[Patient], event_name: str) -> tuple[date | None, date | None]:
+# the getters of the occurred, exported and abstracted date of each patient event, built once instead of formatting
+# the attribute names for every patient
+_EVENT_DATE_GETTERS: dict[str, tuple[Callable[[Any], Any], Callable[[Any], Any], Callable[[Any], Any]]] = {
+    event: (attrgetter(f'{event}_date'), attrgetter(f'{event}_date_exported'), attrgetter(f'{event}_date_abstracted'))
+    for event in ('diagnosis', 'drug', 'death')
+}
+
+
+def calculate_min_max_event_date(patients: PatientArrays, event_name: str) -> tuple[date | None, date | None]:
     """
     Determines the minimum and maximum event date for any event across all patients.
 
     Args:
-        patients (List[Patient]): The list of patients.
+        patients (PatientArrays): The patient cohort.
         event_name (str): The name of the event to check.
 
     Returns:
         tuple[date | None, date | None]: The earliest and latest event dates found,
                                          or None if no events of that type exist.
     """
-    event_dates: list[date] = [
-        getattr(patient, event_name) for patient in patients if getattr(patient, event_name) is not None
-    ]
+    event_dates: DateArray = getattr(patients, event_name)
+    event_dates = event_dates[~np.isnat(event_dates)]
 
-    if not event_dates:  # If there are no event dates, return None for both min and max
+    if not event_dates.size:  # If there are no event dates, return None for both min and max
         return None, None
 
-    return min(event_dates), max(event_dates)
+    return event_dates.min().item(), event_dates.max().item()
 
 
-def calculate_next_abstraction_assessment_date(offset_date: date, sim_params: SimParams) -> date:
+def calculate_abstraction_assessment_dates(sim_params: SimParams) -> Iterator[date]:
     """
-    Calculates the next abstraction assessment date based on the offset date and the database update frequency.
+    Generates the abstraction assessment dates following the study start date, the 2nd day of every
+    db_update_frequency_in_months-th month after the study start month.
 
     Args:
-        offset_date (date): The offset date.
         sim_params (SimParams): The simulation parameters.
 
-    Returns:
+    Yields:
         date: The next abstraction assessment date.
     """
-    return offset_date + relativedelta(months=sim_params.db_update_frequency_in_months, day=2)
+    # the assessment dates are counted in months from the study start month
+    study_start_month = np.datetime64(sim_params.study_start_date, 'M')
+    frequency: int = sim_params.db_update_frequency_in_months
+    for months in count(frequency, frequency):
+        yield ((study_start_month + months).astype('datetime64[D]') + 1).item()
+
+
+def determine_treatment_dates(
+    diagnosis_dates: DateArray,
+    death_dates: DateArray,
+    drug_codes: np.ndarray[Any, np.dtype[np.integer[Any]]],
+    drugs: tuple[Drug, ...],
+    rng: Generator,
+) -> DateArray:
+    """Determines the treatment dates of a batch of patients, within the treatment start date range of their drug
+    after the diagnosis.
+
+    Args:
+        diagnosis_dates (DateArray): The patients' diagnosis dates.
+        death_dates (DateArray): The patients' death dates, NaT for the surviving patients.
+        drug_codes (ndarray): The index of each patient's drug in drugs.
+        drugs (tuple[Drug, ...]): The drugs with the treatment start date range of their patients.
+        rng (Generator): The random generator to draw from.
+
+    Returns:
+        DateArray: The treatment dates, NaT for the patients dying before their treatment.
+    """
+    # Generate the treatment date offsets within the start date range of each patient's drug
+    start_date_ranges = np.array([drug.start_date_range for drug in drugs])[drug_codes]
+    treatment_date_offsets = rng.integers(  # pyright: ignore [reportUnknownMemberType]
+        start_date_ranges[:, 0], start_date_ranges[:, 1], endpoint=True
+    )
+    treatment_dates = diagnosis_dates + treatment_date_offsets.astype('timedelta64[D]')
+    # Patients dying before the treatment date do not receive treatment
+    treatment_dates[~(np.isnat(death_dates) | (treatment_dates < death_dates))] = np.datetime64('NaT')
+    return treatment_dates
 
 
-def determine_treatment_date(
-    diagnosis_date: date,
-    death_date: date | None,
-    treatment_date_range: tuple[int, int],
-) -> date | None:
-    """Determines the treatment date for a given patient.
+def determine_death_dates(
+    diagnosis_dates: DateArray,
+    drug_codes: np.ndarray[Any, np.dtype[np.integer[Any]]],
+    drugs: tuple[Drug, ...],
+    observation_end_date: date,
+    rng: Generator,
+) -> DateArray:
+    """Determines the death dates of a batch of patients, drawn from the survival curve of their drug.
 
     Args:
-        diagnosis_date (date): The patient's diagnosis date.
-        death_date (date): The patient's death date.
-        treatment_fraction_range (tuple[float, float]): The range of treatment fractions.
-        treatment_date_range (tuple[int, int]): The range of treatment dates.
+        diagnosis_dates (DateArray): The patients' diagnosis dates.
+        drug_codes (ndarray): The index of each patient's drug in drugs.
+        drugs (tuple[Drug, ...]): The drugs with the survival probabilities of their patients.
+        observation_end_date (date): The end of the observation period, later deaths are not observed.
+        rng (Generator): The random generator to draw from.
 
     Returns:
-        date: The treatment date.
+        DateArray: The death dates, NaT for the patients surviving the observation period.
     """
-    # Generate a random treatment date offset from the diagnosis date in days
-    treatment_date_offset: int = random.randint(*treatment_date_range)
-    # Generate a random treatment date
-    treatment_date: date = diagnosis_date + timedelta(days=treatment_date_offset)
-    # Ensure that the treatment date is not after the death date
-    if death_date is None or treatment_date < death_date:
-        return treatment_date
-    # Otherwise, return None - indicating that the patient does not receive treatment
-    return None
+    # Draw the survival years per drug, evaluating the interpolator of each drug once for all of its patients
+    year_deltas = np.empty(len(diagnosis_dates))
+    for code, drug in enumerate(drugs):
+        receiving_drug = drug_codes == code
+        year_deltas[receiving_drug] = sample_survival_years(drug.survival_curve, np.count_nonzero(receiving_drug), rng)
+
+    death_dates = diagnosis_dates + np.floor(year_deltas * 365.25).astype('timedelta64[D]')
+    death_dates[death_dates > np.datetime64(observation_end_date, 'D')] = np.datetime64('NaT')
+    return death_dates
 
 
-def determine_death_date(
-    diagnosis_date: date, observation_end_date: date, survival_probabilities: dict[int, float]
-) -> date | None:
-    interpolated = _get_interpolator(tuple(survival_probabilities.keys()), tuple(survival_probabilities.values()))
-    year_delta: float = interpolated([random.random()])[0]
-    death_date: date = diagnosis_date + timedelta(days=year_delta * 365.25)
-    if death_date > observation_end_date:
-        return None
+def sample_survival_years(
+    survival_curve: tuple[tuple[int, ...], tuple[float, ...]], n: int, rng: Generator
+) -> np.ndarray[Any, np.dtype[np.float64]]:
+    """Draws the number of years survived by n patients following the survival curve.
 
-    return death_date
+    Args:
+        survival_curve (tuple[tuple[int, ...], tuple[float, ...]]): The years and survival probabilities.
+        n (int): The number of patients.
+        rng (Generator): The random generator to draw from.
+
+    Returns:
+        ndarray: The years survived by each patient.
+    """
+    # the survival table maps the survival probability to the years, look up all draws at once
+    survival_probabilities, survival_years = _get_survival_table(*survival_curve)
+    return np.interp(rng.random(n), survival_probabilities, survival_years)
 
 
 @cache
-def _get_interpolator(survival_years: tuple[int, ...], survival_probabilities: tuple[float, ...]) -> PchipInterpolator:
-    x = [1.0]
-    x.extend(survival_probabilities)
-    y = [0]
-    y.extend(survival_years)
-    return PchipInterpolator(x[::-1], y[::-1], extrapolate=True)
+def _get_survival_table(
+    survival_years: tuple[int, ...], survival_probabilities: tuple[float, ...]
+) -> tuple[np.ndarray[Any, np.dtype[np.float64]], np.ndarray[Any, np.dtype[np.float64]]]:
+    # the interpolator evaluated on a dense grid of survival probabilities, linear interpolation within the table
+    # is cheaper than evaluating the cubic interpolator for every draw and off by well below a day
+    grid = np.linspace(0, 1, _SURVIVAL_TABLE_SIZE, dtype=np.float64)
+    return grid, np.asarray(_get_interpolator(survival_years, survival_probabilities)(grid), dtype=np.float64)
 
 
-def simulate_delayed_recording_date(event_date: date | None, latency_range: tuple[int, int]) -> date | None:
+@cache
+def _get_interpolator(survival_years: tuple[int, ...], survival_probabilities: tuple[float, ...]) -> PchipInterpolator:
+    # the survival probabilities in increasing order followed by the certain survival at year 0, filled in place
+    probabilities = np.empty(len(survival_probabilities) + 1)
+    probabilities[:-1] = survival_probabilities[::-1]
+    probabilities[-1] = 1.0
+    years = np.empty(len(survival_years) + 1)
+    years[:-1] = survival_years[::-1]
+    years[-1] = 0
+    return PchipInterpolator(probabilities, years, extrapolate=True)
+
+
+def simulate_delayed_recording_dates(
+    event_dates: DateArray, latency_range: tuple[int, int], rng: Generator
+) -> DateArray:
     """
-    Simulates the delayed recording date for a given event date.
+    Simulates the delayed recording dates for a batch of event dates.
 
     Args:
-        event_date (date): The event date.
+        event_dates (DateArray): The event dates, NaT for events that did not occur.
         latency_range (tuple[int, int]): The range of latencies in days.
+        rng (Generator): The random generator to draw from.
 
     Returns:
-        date: The delayed recording date.
+        DateArray: The delayed recording dates, NaT where the event date is NaT.
     """
-    if event_date is None:
-        return None
-    latency_days = random.randint(*latency_range)
-    return event_date + timedelta(days=latency_days)
+    return event_dates + _random_days(latency_range, len(event_dates), rng)
 
 
-def calculate_exported_date(
-    event_date: date | None, study_start_date: date, db_update_frequency_in_months: int
-) -> date | None:
+def calculate_exported_dates(
+    event_dates: DateArray, study_start_date: date, db_update_frequency_in_months: int
+) -> DateArray:
     """
-    Calculates the date when the data would be exported to the database for a given event date.
+    Calculates the dates when the data would be exported to the database for the given event dates.
     The data is exported to the database on a x-monthly basis (default is monthly on the first day of the month).
 
     Args:
-        event_date (date): The date when the event was recorded in the EHR.
+        event_dates (DateArray): The dates when the events were recorded in the EHR, NaT if they did not occur.
         study_start_date (date): The date when the study began.
         db_update_frequency_in_months (int): The frequency, in months, at which the database is updated.
 
     Returns:
-        date: The date when the data would be exported to the database.
+        DateArray: The dates when the data would be exported to the database, NaT for events that did not occur.
     """
-    if not event_date:
-        return None
-
-    if event_date < study_start_date:
-        # If the event date is before the study start date, set the export date
-        # to the first export cycle after the study start date
-        return study_start_date.replace(day=1) + relativedelta(months=db_update_frequency_in_months)
-
-    # Calculate the time difference from the event date to the study start date
-    months_since_study_start = (
-        (event_date.year - study_start_date.year) * 12 + event_date.month - study_start_date.month
+    # Count the months since the study start month, the export cycles start at the study start month
+    study_start_month = np.datetime64(study_start_date, 'M')
+    months_since_study_start = (event_dates.astype('datetime64[M]') - study_start_month).astype(np.int64)
+
+    # Months until the next export cycle, events falling exactly on an export cycle are exported on the next cycle
+    months_until_next_export = db_update_frequency_in_months - months_since_study_start % db_update_frequency_in_months
+    # Events before the study start date are exported on the first export cycle after the study start date
+    months_until_next_export = np.where(
+        event_dates < np.datetime64(study_start_date, 'D'),
+        db_update_frequency_in_months - months_since_study_start,
+        months_until_next_export,
     )
 
-    # Find out how many months until the next export cycle
-    months_since_last_export = months_since_study_start % db_update_frequency_in_months
-    months_until_next_export = db_update_frequency_in_months - months_since_last_export
-
-    if months_since_last_export == 0:
-        # If the event happens to fall exactly on an export cycle, set the next export to the next cycle
-        months_until_next_export = db_update_frequency_in_months
+    # The next export is on the first day of its month
+    export_months = event_dates.astype('datetime64[M]') + months_until_next_export.astype('timedelta64[M]')
+    return np.where(np.isnat(event_dates), event_dates, export_months.astype('datetime64[D]'))
 
-    # Calculate the next export date
-    next_export_date = event_date + relativedelta(months=months_until_next_export)
-    # Set the day to the first of the month
-    return next_export_date.replace(day=1)
 
-
-def is_event_exported(event_date: date | None, event_date_exported: date | None, export_date: date) -> bool:
+def is_event_exported(event_dates: DateArray, event_dates_exported: DateArray, export_date: date) -> BoolArray:
     """
-    Determines whether an event is exported by the given export date.
-    On the given export date, the event is considered to be exported
-     * if the event date (or event date recorded for death_date), is not None since there is nothing to export;
-     * if the event export date is not None, since it had already been exported on that date;
+    Determines whether the events are exported by the given export date.
+    On the given export date, an event is considered to be exported
+     * if the event date (or event date recorded for death_date), is NaT since there is nothing to export;
+     * if the event export date is not NaT, since it had already been exported on that date;
      * if the event export date is after the export date, since it has not occurred yet;
 
     Args:
-        event_date (date): The date when the event occurred.
-        event_date_exported (date): The date when the event was exported.
+        event_dates (DateArray): The dates when the events occurred.
+        event_dates_exported (DateArray): The dates when the events were exported.
         export_date (date): The date when the data are being assessed for export.
 
     Returns:
-        bool: Whether the event is exported.
+        BoolArray: Whether each event is exported.
     """
-    # If the event hasn't occurred, it's considered exported
-    if event_date is None:
-        return True
-
-    # If the event occurred but hasn't been exported, it's not exported
-    if event_date_exported is None:
-        return False
+    # If the event hasn't occurred, it's considered exported.
+    # Otherwise it's exported if it has been exported before or on the export date, a NaT export date compares false.
+    return np.isnat(event_dates) | (event_dates_exported <= np.datetime64(export_date, 'D'))
 
-    # If the event has been exported before or on the export date, it's exported
-    return event_date_exported <= export_date
 
-
-def is_patient_fully_exported(patient: Patient, export_date: date) -> bool:
+def is_patient_fully_exported(patients: PatientArrays, export_date: date) -> BoolArray:
     """
-    Determines whether a patient is fully exported.
+    Determines which patients are fully exported.
     A patient is fully exported if all of its events are considered to be exported on the given export date.
 
     Args:
-        patient (Patient): The patient.
+        patients (PatientArrays): The patient cohort.
         export_date (date): The date when the data are being exported to the database.
 
     Returns:
-        bool: Whether the patient is fully exported.
+        BoolArray: Whether each patient is fully exported.
     """
-    event_pairs: list[tuple[date | None, date | None]] = [
-        (patient.diagnosis_date, patient.diagnosis_date_exported),
-        (patient.drug_date, patient.drug_date_exported),
-        (patient.drug_date, patient.drug_date_exported),
-        (patient.death_date_recorded, patient.death_date_exported),
-    ]
-    return all(
-        is_event_exported(event_date, event_date_exported, export_date)
-        for event_date, event_date_exported in event_pairs
+    # combine the masks of the events one by one, instead of stacking them into a temporary 2d array to reduce
+    return (
+        is_event_exported(patients.diagnosis_date, patients.diagnosis_date_exported, export_date)
+        & is_event_exported(patients.drug_date, patients.drug_date_exported, export_date)
+        & is_event_exported(patients.death_date_recorded, patients.death_date_exported, export_date)
     )
 
 
-def generate_patient_cohort(sim_params: SimParams) -> list[Patient]:
+def generate_patient_cohort(sim_params: SimParams, rng: Generator) -> PatientArrays:
     """
     Generates a cohort of patients with simulated diagnosis, treatment, and death dates.
 
     Args:
     sim_params (SimParams): The simulation parameters.
+    rng (Generator): The random generator to draw from.
 
     Returns:
-    List[Patient]: A list of patient records.
+    PatientArrays: The patient records stored column-wise, the export and abstraction dates are not set yet.
     """
-    cohort: list[Patient] = []
-    for patient_id in range(1, sim_params.cohort_size + 1):
-        # Generate a random diagnosis date
-        diagnosis_date = simutils.generate_random_date(
-            sim_params.observation_start_date, sim_params.observation_end_date
-        )
-        # Select a random drug from those configured
-        drug = simutils.select_drug(
-            diagnosis_date, sim_params.drugs, sim_params.observation_start_date, sim_params.observation_end_date
-        )
-        # Generate a random death date
-        death_date = determine_death_date(diagnosis_date, sim_params.observation_end_date, drug.survival_probabilities)
-        # Generate death date recorded date with a random delay within the range of the death date recording latency
-        death_date_recorded = (
-            simulate_delayed_recording_date(death_date, sim_params.death_date_recording_latency_range)
-            if death_date
-            else None
-        )
-        # Generate a random treatment date
-        drug_date = determine_treatment_date(
-            diagnosis_date,
-            death_date,
-            drug.start_date_range,
-        )
-        # Create a patient record and add it to the cohort
-        cohort.append(
-            Patient(
-                patient_id=patient_id,
-                drug=drug,
-                diagnosis_date=Timestamp(diagnosis_date),
-                drug_date=Timestamp(drug_date) if drug_date else None,
-                death_date=Timestamp(death_date) if death_date else None,
-                death_date_recorded=Timestamp(death_date_recorded) if death_date_recorded else None,
-                diagnosis_date_exported=None,
-                drug_date_exported=None,
-                death_date_exported=None,
-                diagnosis_date_abstracted=None,
-                drug_date_abstracted=None,
-                death_date_abstracted=None,
-            )
-        )
-    return cohort
+    cohort_size: int = sim_params.cohort_size
+    drugs: tuple[Drug, ...] = sim_params.drugs
+    # Generate the random diagnosis dates for the whole cohort at once
+    diagnosis_dates = simutils.generate_random_dates(
+        sim_params.observation_start_date, sim_params.observation_end_date, cohort_size, rng
+    )
+    # Select a random drug for each patient from those configured
+    drug_codes = simutils.select_drugs(
+        diagnosis_dates, drugs, sim_params.observation_start_date, sim_params.observation_end_date, rng
+    )
+
+    # Generate the random death dates, patients surviving the observation period have none
+    death_dates = determine_death_dates(diagnosis_dates, drug_codes, drugs, sim_params.observation_end_date, rng)
+    # Generate death date recorded dates with a random delay within the range of the death date recording latency
+    death_dates_recorded = simulate_delayed_recording_dates(
+        death_dates, sim_params.death_date_recording_latency_range, rng
+    )
 
+    # Generate the treatment dates within the start date range of each patient's drug, patients dying before the
+    # treatment date do not receive treatment
+    drug_dates = determine_treatment_dates(diagnosis_dates, death_dates, drug_codes, drugs, rng)
+
+    # Create the patient records of the cohort
+    not_set = np.full(cohort_size, np.datetime64('NaT'), dtype='datetime64[D]')
+    return PatientArrays(
+        drugs=drugs,
+        patient_id=np.arange(1, cohort_size + 1, dtype=np.int64),
+        drug_codes=drug_codes.astype(np.int16),
+        diagnosis_date=diagnosis_dates,
+        diagnosis_date_exported=not_set.copy(),
+        diagnosis_date_abstracted=not_set.copy(),
+        drug_date=drug_dates,
+        drug_date_exported=not_set.copy(),
+        drug_date_abstracted=not_set.copy(),
+        death_date=death_dates,
+        death_date_recorded=death_dates_recorded,
+        death_date_exported=not_set.copy(),
+        death_date_abstracted=not_set.copy(),
+    )
 
-def generate_exported_dates(patients: list[Patient], sim_params: SimParams) -> None:
+
+def _random_days(day_range: tuple[int, int], n: int, rng: Generator) -> np.ndarray[Any, np.dtype[np.timedelta64]]:
+    # a batch of random numbers of days within the range, both ends inclusive
+    day_counts = rng.integers(day_range[0], day_range[1], size=n, endpoint=True)  # pyright: ignore [reportUnknownMemberType]
+    return day_counts.astype('timedelta64[D]')
+
+
+def generate_exported_dates(patients: PatientArrays, sim_params: SimParams) -> None:
     """
-    Iterates over the patients and assigns exported dates to the events that have not been exported yet.
+    Assigns exported dates to the events of the patients.
 
     Args:
-        patients (List[Patient]): The list of patients to process.
+        patients (PatientArrays): The patient cohort to process.
         sim_params (SimParams): The simulation parameters.
     """
-    for patient in patients:
-        for event_name in [
-            'diagnosis_date',
-            'drug_date',
-            'death_date_recorded',
-        ]:
-            # For death_date, we use death_date_recorded as the event date
-            event_date: Timestamp | None = getattr(patient, event_name)
-
-            # remove the _recorded suffix from the death_date and
-            # append _exported to create the exported date attribute name
-            exported_date_attr: str = f"{event_name.replace('_recorded', '')}_exported"
-
-            exported_date = calculate_exported_date(
-                event_date=event_date.date() if event_date else None,
-                db_update_frequency_in_months=sim_params.db_update_frequency_in_months,
-                study_start_date=sim_params.study_start_date,
-            )
-            # Set the exported date attribute to the calculated exported date
-            setattr(patient, exported_date_attr, Timestamp(exported_date) if exported_date else None)
+    for event_name in [
+        'diagnosis_date',
+        'drug_date',
+        'death_date_recorded',
+    ]:
+        # For death_date, we use death_date_recorded as the event date
+        event_dates: DateArray = getattr(patients, event_name)
+
+        # remove the _recorded suffix from the death_date and
+        # append _exported to create the exported date attribute name
+        exported_dates: DateArray = getattr(patients, f"{event_name.replace('_recorded', '')}_exported")
+
+        # Set the exported dates to the calculated exported dates
+        exported_dates[:] = calculate_exported_dates(
+            event_dates=event_dates,
+            db_update_frequency_in_months=sim_params.db_update_frequency_in_months,
+            study_start_date=sim_params.study_start_date,
+        )
 
 
 def is_event_abstractable(
-    event_date_exported: date | None,
-    event_date_abstracted: date | None,
+    event_dates_exported: DateArray,
+    event_dates_abstracted: DateArray,
     assessment_date: date,
-) -> bool:
+) -> BoolArray:
     """
-    Determines whether an event is ready for abstraction based on its export and abstraction status.
+    Determines which events are ready for abstraction based on their export and abstraction status.
 
     An event is ready for abstraction if it has been exported to the database by the assessment date
     and has not yet been abstracted by the assessment date.
 
     Args:
-        event_date_exported: The date when the event was exported to the database.
-        event_date_abstracted: The date when the event was last abstracted.
+        event_dates_exported: The dates when the events were exported to the database.
+        event_dates_abstracted: The dates when the events were last abstracted.
         assessment_date: The date when the data is being assessed for abstraction.
 
     Returns:
-        bool: True if the event is ready for abstraction, False otherwise.
+        BoolArray: True for the events ready for abstraction, False otherwise.
     """
-    is_abstractable: bool = True
-    # If the event has already been abstracted or has not been exported, it's not ready for abstraction
-    if event_date_abstracted is not None:
-        is_abstractable = False
-    # If the event has not been exported or has been exported after the assessment date, it's not ready for abstraction
-    if event_date_exported is None or event_date_exported > assessment_date:
-        is_abstractable = False
-    # In any other case, the event is not ready for abstraction
-    return is_abstractable
-
-
-def is_patient_abstractable(patient: Patient, assessment_date: date) -> bool:
+    # If the event has already been abstracted it's not ready for abstraction, neither if it has not been exported
+    # or has been exported after the assessment date, a NaT export date compares false
+    return np.isnat(event_dates_abstracted) & (event_dates_exported <= np.datetime64(assessment_date, 'D'))
+
+
+def is_patient_abstractable(patients: PatientArrays, assessment_date: date) -> BoolArray:
     """
-    Determines whether any event of a patient is ready for abstraction.
+    Determines which patients have any event ready for abstraction.
 
     Args:
-        patient: The patient object containing event dates and their exported/abstracted status.
+        patients: The patient cohort containing event dates and their exported/abstracted status.
         assessment_date: The date when the data is being assessed for abstraction.
 
     Returns:
-        bool: True if any event of the patient is ready for abstraction, False otherwise.
+        BoolArray: True for the patients with any event ready for abstraction, False otherwise.
     """
-    # Return True if any event of the patient is ready for abstraction
-    return any(
-        # Check each event in the patient record to see if it's ready for abstraction
-        is_event_abstractable(
-            event_date_exported=getattr(patient, f'{event}_date_exported').date()
-            if getattr(patient, f'{event}_date_exported')
-            else None,
-            event_date_abstracted=getattr(patient, f'{event}_date_abstracted').date()
-            if getattr(patient, f'{event}_date_abstracted')
-            else None,
-            assessment_date=assessment_date,
-        )
-        # Iterate over the patient events
-        for event in ['diagnosis', 'drug', 'death']
+    # True for the patients with any event ready for abstraction
+    return (
+        is_event_abstractable(patients.diagnosis_date_exported, patients.diagnosis_date_abstracted, assessment_date)
+        | is_event_abstractable(patients.drug_date_exported, patients.drug_date_abstracted, assessment_date)
+        | is_event_abstractable(patients.death_date_exported, patients.death_date_abstracted, assessment_date)
     )
 
 
-def is_patient_fully_abstracted(patient: Patient) -> bool:
+def is_patient_fully_abstracted(patients: PatientArrays) -> BoolArray:
     """
-    Determines whether a patient is fully abstracted.
+    Determines which patients are fully abstracted.
     A patient is fully abstracted if all of its events are considered to be abstracted.
-    That means all not None events are exported and abstracted.
+    That means all events that are not NaT are exported and abstracted.
 
     Args:
-        patient (Patient): The patient.
+        patients (PatientArrays): The patient cohort.
 
     Returns:
-        bool: Whether the patient is fully abstracted.
+        BoolArray: Whether each patient is fully abstracted.
     """
-    is_fully_abstracted: bool = True
-    # Checking each event in the patient record
-    events: list[tuple[date | None, date | None]] = [
-        (patient.diagnosis_date, patient.diagnosis_date_abstracted),
-        (patient.drug_date, patient.drug_date_abstracted),
-        (patient.drug_date, patient.drug_date_abstracted),
-        (patient.death_date, patient.death_date_abstracted),
-    ]
-    # Iterating over each event in the patient record and checking if it's abstracted.
-    for event_date, event_date_abstracted in events:
-        # If the event date is not None, check if it's exported and abstracted
-        if event_date is not None and event_date_abstracted is None:
-            # If the event did occur but was not abstracted, set is_fully_abstracted to False
-            is_fully_abstracted = False
-
-    # If all not None events are abstracted, return True.
-    return is_fully_abstracted
+    # A patient is fully abstracted if each event either did not occur or was abstracted
+    return (
+        (np.isnat(patients.diagnosis_date) | ~np.isnat(patients.diagnosis_date_abstracted))
+        & (np.isnat(patients.drug_date) | ~np.isnat(patients.drug_date_abstracted))
+        & (np.isnat(patients.death_date_recorded) | ~np.isnat(patients.death_date_abstracted))
+    )
 
 
 def set_events_abstracted_date(
-    sim_params: SimParams,
-    patient: Patient,
+    patients: PatientArrays,
+    patient_indices: np.ndarray[Any, np.dtype[np.intp]],
     event_name: str,
+    latency_range: tuple[int, int],
     assessment_date: date,
+    rng: Generator,
 ) -> None:
-    event_exported_name = f'{event_name}_date_exported'
-    event_abstracted_name = f'{event_name}_date_abstracted'
-    event_exported_date: date | None = (
-        getattr(patient, event_exported_name).date() if getattr(patient, event_exported_name) else None
-    )
-    abstracted_date: date | None = (
-        getattr(patient, event_abstracted_name).date() if getattr(patient, event_abstracted_name) else None
-    )  # Check if the event can be abstracted.
+    _, get_exported, get_abstracted = _EVENT_DATE_GETTERS[event_name]
+    exported_dates: DateArray = get_exported(patients)
+    abstracted_dates: DateArray = get_abstracted(patients)
+    # Check which events can be abstracted.
     # An event can be abstracted if it has been exported before the assessment date
     # and the event's abstraction date is not set yet.
-    if is_event_abstractable(
-        event_date_exported=event_exported_date,
-        event_date_abstracted=abstracted_date,
-        assessment_date=assessment_date,
-    ):
-        # Calculate the abstracted date based on the event's abstraction latency range
-        latency_range = getattr(sim_params, f'{event_name}_date_abstraction_latency_range')
-        abstraction_latency = random.randint(*latency_range)
-        abstracted_date = event_exported_date + timedelta(days=abstraction_latency)
+    abstractable_indices = patient_indices[
+        is_event_abstractable(
+            event_dates_exported=exported_dates[patient_indices],
+            event_dates_abstracted=abstracted_dates[patient_indices],
+            assessment_date=assessment_date,
+        )
+    ]
 
-        # Update the patient record
-        setattr(patient, event_abstracted_name, Timestamp(abstracted_date))
+    # Calculate the abstracted dates based on the event's abstraction latency range
+    abstraction_latencies = _random_days(latency_range, len(abstractable_indices), rng)
 
+    # Update the patient records
+    abstracted_dates[abstractable_indices] = exported_dates[abstractable_indices] + abstraction_latencies
 
-def generate_abstracted_dates(patients: list[Patient], sim_params: SimParams) -> None:
+
+def generate_abstracted_dates(patients: PatientArrays, sim_params: SimParams, rng: Generator) -> None:
     """
-    Iterates over the patients and assigns abstracted dates to the events that have been exported but not yet
+    Iterates over the assessment dates and assigns abstracted dates to the events that have been exported but not yet
     abstracted.
 
     Args:
-        patients (List[Patient]): The list of patients to process.
+        patients (PatientArrays): The patient cohort to process.
         sim_params (SimParams): The simulation parameters.
+        rng (Generator): The random generator to draw from.
     """
-
-    # Initialize the assessment_date
-    assessment_date: date = calculate_next_abstraction_assessment_date(
-        offset_date=sim_params.study_start_date,
-        sim_params=sim_params,
-    )
-
-    while True:
+    # The abstraction latency range of each event, looked up once instead of per event and assessment date
+    latency_ranges: dict[str, tuple[int, int]] = {
+        'diagnosis': sim_params.diagnosis_date_abstraction_latency_range,
+        'drug': sim_params.drug_date_abstraction_latency_range,
+        'death': sim_params.death_date_abstraction_latency_range,
+    }
+    # The number of patients not fully abstracted yet, counted down instead of checking all patients at every
+    # assessment date
+    num_remaining: int = len(patients) - np.count_nonzero(is_patient_fully_abstracted(patients))
+
+    for assessment_date in calculate_abstraction_assessment_dates(sim_params):
         # Determine patients with events that can be abstracted at the current assessment_date
-        abstractable_patients = [patient for patient in patients if is_patient_abstractable(patient, assessment_date)]
+        abstractable_patients = np.flatnonzero(is_patient_abstractable(patients, assessment_date))
 
-        if not abstractable_patients:
+        if not len(abstractable_patients):
             break  # Exit the loop if there are no abstractable patients
 
         # Select patients to abstract
-        patients_to_abstract = random.sample(
+        patients_to_abstract = rng.choice(
             abstractable_patients,
             # Limit the number of patients to abstract to the number of patients
             # that can be abstracted per db updates frequency (nr of months)
@@ -444,30 +471,30 @@ def generate_abstracted_dates(patients: list[Patient], sim_params: SimParams) ->
                 sim_params.patients_abstracted_per_month * sim_params.db_update_frequency_in_months,
                 len(abstractable_patients),
             ),
+            replace=False,
         )
 
-        # Assign abstracted dates to the selected patients' events
-        for patient in patients_to_abstract:
-            for event_name in ['diagnosis', 'drug', 'death']:
-                set_events_abstracted_date(
-                    sim_params=sim_params,
-                    patient=patient,
-                    event_name=event_name,
-                    assessment_date=assessment_date,
-                )
-
-        # Move to the next month and update the assessment date
-        assessment_date = calculate_next_abstraction_assessment_date(
-            offset_date=assessment_date,
-            sim_params=sim_params,
-        )
+        # Assign abstracted dates to the selected patients' events, a batch of patients per event
+        for event_name, latency_range in latency_ranges.items():
+            set_events_abstracted_date(
+                patients=patients,
+                patient_indices=patients_to_abstract,
+                event_name=event_name,
+                latency_range=latency_range,
+                assessment_date=assessment_date,
+                rng=rng,
+            )
+
+        # Only the selected patients can have become fully abstracted, none of them was before as each had an event
+        # to abstract
+        num_remaining -= np.count_nonzero(is_patient_fully_abstracted(patients.take(patients_to_abstract)))
 
         # Check if all patients are fully abstracted; if so, break the loop
-        if all(is_patient_fully_abstracted(patient) for patient in patients):
+        if not num_remaining:
             break
 
 
-def sanity_check_patient_records(patients: list[Patient]) -> None:
+def sanity_check_patient_records(patients: PatientArrays) -> None:
     """
     Sanity checks the patient records.
     Checks if the patient records are consistent. For each patient, it checks:
@@ -477,40 +504,43 @@ def sanity_check_patient_records(patients: list[Patient]) -> None:
     - If the death date is recorded and recorded correctly.
 
     Args:
-        patients (List[Patient]): The list of patients to check.
+        patients (PatientArrays): The patient cohort to check.
 
     Raises:
         Exception: If the patient records are inconsistent.
     """
-    for patient in patients:
-        if patient.diagnosis_date is None:
-            raise Exception(f'Diagnosis date is not set for patient {patient.patient_id}')
-
-        if patient.death_date and (
-            patient.death_date_recorded is None or patient.death_date > patient.death_date_recorded
-        ):
-            raise Exception(f'Death date is recorded incorrectly for patient {patient.patient_id}')
-
-        for event in ['diagnosis', 'drug', 'death']:
-            event_date: date | None = getattr(patient, f'{event}_date')
-            event_date_exported: date | None = getattr(patient, f'{event}_date_exported')
-            event_date_abstracted: date | None = getattr(patient, f'{event}_date_abstracted')
-
-            if event_date and event_date_exported and event_date > event_date_exported:
-                raise Exception(f'{event.capitalize()} date is after its export date for patient {patient.patient_id}')
-
-            if event_date_exported and event_date_abstracted and event_date_exported > event_date_abstracted:
-                raise Exception(
-                    f'{event.capitalize()} export date is after its abstraction date for patient {patient.patient_id}'
-                )
+    # The mask of the inconsistent patients for each check and the message reporting them, NaT compares false so
+    # the dates are only compared if both are set
+    checks: list[tuple[BoolArray, str]] = [
+        (np.isnat(patients.diagnosis_date), 'Diagnosis date is not set for patient {}'),
+        (
+            ~np.isnat(patients.death_date) & ~(patients.death_date <= patients.death_date_recorded),
+            'Death date is recorded incorrectly for patient {}',
+        ),
+    ]
+    for event, (get_date, get_exported, get_abstracted) in _EVENT_DATE_GETTERS.items():
+        event_dates: DateArray = get_date(patients)
+        event_dates_exported: DateArray = get_exported(patients)
+        event_dates_abstracted: DateArray = get_abstracted(patients)
+        name = event.capitalize()
+        checks += [
+            (event_dates > event_dates_exported, f'{name} date is after its export date for patient {{}}'),
+            (
+                event_dates_exported > event_dates_abstracted,
+                f'{name} export date is after its abstraction date for patient {{}}',
+            ),
+            (event_dates > event_dates_abstracted, f'{name} date is after its abstraction date for patient {{}}'),
+        ]
 
-            if event_date and event_date_abstracted and event_date > event_date_abstracted:
-                raise Exception(
-                    f'{event.capitalize()} date is after its abstraction date for patient {patient.patient_id}'
-                )
+    # Report the first inconsistent patient and its first failed check, like checking patient by patient would
+    first_failures: list[int] = [int(np.argmax(failed)) for failed, _ in checks if failed.any()]
+    if first_failures:
+        index = min(first_failures)
+        message = next(message for failed, message in checks if failed[index])
+        raise Exception(message.format(patients.patient_id[index]))
 
 
-def run_simulation(simulation_params: SimParams) -> DataFrame:
+def run_simulation(simulation_params: SimParams, rng: Generator | None = None) -> PatientArrays:
     print('##########################################################################')
     print('#  Simulation parameters:                                               #')
     print('##########################################################################')
@@ -518,7 +548,8 @@ def run_simulation(simulation_params: SimParams) -> DataFrame:
     print('##########################################################################')
     print()
     # Generate patient data
-    cohort: list[Patient] = generate_patient_cohort(simulation_params)
+    rng = default_rng() if rng is None else rng
+    cohort: PatientArrays = generate_patient_cohort(simulation_params, rng)
     print(f'Generated patient cohort for {len(cohort)} patients.')
 
     # Assign export dates to the events of the patients
@@ -526,10 +557,10 @@ def run_simulation(simulation_params: SimParams) -> DataFrame:
     print(f'Generated export dates for {len(cohort)} patients.')
 
     # Assign abstracted dates to the events of the patients
-    generate_abstracted_dates(patients=cohort, sim_params=simulation_params)
+    generate_abstracted_dates(patients=cohort, sim_params=simulation_params, rng=rng)
     # Filter patients who are fully abstracted now at the assessment date.
-    fully_abstracted_patients: list[Patient] = [patient for patient in cohort if is_patient_fully_abstracted(patient)]
-    print(f'Fully abstracted {len(fully_abstracted_patients)} patients.')
+    num_fully_abstracted_patients: int = np.count_nonzero(is_patient_fully_abstracted(cohort))
+    print(f'Fully abstracted {num_fully_abstracted_patients} patients.')
 
     try:
         sanity_check_patient_records(cohort)
@@ -545,26 +576,6 @@ def run_simulation(simulation_params: SimParams) -> DataFrame:
             min_date, max_date = calculate_min_max_event_date(cohort, event_name)
             print(f'{event_name} min: {min_date} and max: {max_date}.')
 
-    # convert the patient time data to a pandas dataframe
-    cohort_df: DataFrame = DataFrame(cohort)
-    cohort_df = cohort_df.sort_values(by='diagnosis_date')  # pyright: ignore [reportUnknownMemberType]
-
-    # rearrange the columns to juxtaposition the event date with the export date and the abstracted date
-    cohort_df = cohort_df[
-        [
-            'patient_id',
-            'drug',
-            'diagnosis_date',
-            'diagnosis_date_exported',
-            'diagnosis_date_abstracted',
-            'drug_date',
-            'drug_date_exported',
-            'drug_date_abstracted',
-            'death_date',
-            'death_date_recorded',
-            'death_date_exported',
-            'death_date_abstracted',
-        ]
-    ]
-
-    return cohort_df
+    # sort the patients by their diagnosis date, the columns juxtapose the event date with the export date and the
+    # abstracted date
+    return cohort.take(np.argsort(cohort.diagnosis_date, kind='stable'))
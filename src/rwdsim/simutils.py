@@ -1,5 +1,4 @@
-import random
-from datetime import date, timedelta
+from datetime import date
 from functools import cache
 from typing import Any
 
@@ -9,31 +8,56 @@ from scipy.interpolate import PchipInterpolator
 from rwdsim.classes import Drug
 
 
-def generate_random_date(start_date: date, end_date: date) -> date:
-    """Generate a random date within the specified year.
+def generate_random_dates(
+    start_date: date, end_date: date, n: int, rng: np.random.Generator
+) -> np.ndarray[Any, np.dtype[np.datetime64]]:
+    """Generate a batch of random dates between the start and end date, both inclusive.
 
     Args:
-        start_date (int): The year to start generating random dates for.
-        end_date (int): The year to stop generating random dates for.
+        start_date (date): The earliest date to generate.
+        end_date (date): The latest date to generate.
+        n (int): The number of dates to generate.
+        rng (Generator): The random generator to draw from.
 
     Returns:
-        date: A random date between start_date and end_date.
+        ndarray: The random dates as datetime64[D] array.
     """
-    return start_date + timedelta(days=random.randint(0, (end_date - start_date).days))
+    day_offsets = rng.integers(0, (end_date - start_date).days, size=n, endpoint=True)  # pyright: ignore [reportUnknownMemberType]
+    return np.datetime64(start_date, 'D') + day_offsets.astype('timedelta64[D]')
 
 
-def select_drug(diagnosis_date: date, drugs: tuple[Drug, ...], observation_start: date, observation_end: date) -> Drug:
-    normalized_progress = (diagnosis_date - observation_start) / (observation_end - observation_start)
-    interps: list[PchipInterpolator] = _get_interpolated_drug_weights((drug.probability_weights for drug in drugs))
-    probs: np.ndarray[Any, np.dtype[np.float64]] = np.array([interp([normalized_progress])[0] for interp in interps])
-    probs /= probs.sum()
-    rand: float = random.random()
-    prob_sum: float = 0
-    for i in range(len(probs)):
-        prob_sum += probs[i]
-        if rand <= prob_sum:
-            return drugs[i]
-    raise Exception('Failed to select a drug, please check that each drug has at least 1 weight configured.')
+def select_drugs(
+    diagnosis_dates: np.ndarray[Any, np.dtype[np.datetime64]],
+    drugs: tuple[Drug, ...],
+    observation_start: date,
+    observation_end: date,
+    rng: np.random.Generator,
+) -> np.ndarray[Any, np.dtype[np.intp]]:
+    """Select a drug for each of the diagnosis dates.
+
+    Args:
+        diagnosis_dates (ndarray): The diagnosis dates as datetime64[D] array.
+        drugs (tuple[Drug, ...]): The drugs to select from.
+        observation_start (date): The start of the observation period the drug weights are spread over.
+        observation_end (date): The end of the observation period the drug weights are spread over.
+        rng (Generator): The random generator to draw from.
+
+    Returns:
+        ndarray: The index of the selected drug in drugs for each diagnosis date.
+    """
+    normalized_progress = (diagnosis_dates - np.datetime64(observation_start, 'D')) / np.timedelta64(
+        (observation_end - observation_start).days, 'D'
+    )
+    interps: list[PchipInterpolator] = _get_interpolated_drug_weights(tuple(drug.probability_weights for drug in drugs))
+    # the cumulative distributions of the drug weights, a row per drug and a column per diagnosis date
+    cum_probs: np.ndarray[Any, np.dtype[np.float64]] = np.cumsum(
+        [interp(normalized_progress) for interp in interps], 0, dtype=np.float64
+    )
+    if not (cum_probs[-1] > 0).all():
+        raise Exception('Failed to select a drug, please check that each drug has at least 1 weight configured.')
+    cum_probs /= cum_probs[-1]
+    # the first drug reaching the draw is selected, which is the number of drugs below it
+    return np.count_nonzero(cum_probs < rng.random(len(diagnosis_dates)), axis=0)
 
 
 @cache
@@ -77,20 +101,21 @@ def calculate_probabilities_over_period(
     if end_prob < 0 or end_prob > 1:
         raise ValueError('End probability must be between 0 and 1.')
 
+    if observation_period == 1:
+        # there are no increments to spread the change in probability over
+        raise ValueError('Observation period must be at least 2 years to change the probability over.')
+
     np.random.seed(42)  # Ensure reproducible results
     total_change: float = end_prob - start_prob  # Total change required over the period
     increments = np.random.rand(observation_period - 1)  # Random increments for variability
     increments *= total_change / sum(increments)  # Scale increments to sum to total change
 
-    probabilities: list[float] = [start_prob]  # Initialize probabilities list with start probability
-    for increment in increments:
-        next_prob = probabilities[-1] + increment  # Calculate next probability
-        probabilities.append(next_prob)
-
+    # Accumulate the increments onto the start probability in a single pass
+    probabilities = np.cumsum(np.concatenate(([start_prob], increments)))
     probabilities[-1] = end_prob  # Ensure exact end probability
 
     # Generate and return dictionary of year: probability pairs
-    return dict(zip(range(start_year, start_year + observation_period), probabilities, strict=False))
+    return dict(zip(range(start_year, start_year + observation_period), probabilities.tolist(), strict=True))
 
 
 def normalize_probabilities(probabilities: dict[int, float]) -> list[float]:
@@ -105,9 +130,8 @@ def normalize_probabilities(probabilities: dict[int, float]) -> list[float]:
     """
     if len(probabilities) < 1:
         raise ValueError('Cannot normalize an empty dictionary.')
-    total_prob = sum(probabilities.values())
-    normalized_probs = [prob / total_prob for prob in probabilities.values()]
-    return normalized_probs
+    probs = np.fromiter(probabilities.values(), dtype=np.float64, count=len(probabilities))
+    return (probs / probs.sum()).tolist()
 
 
 def calculate_missing_probabilities(survival_dict: dict[int, float], observation_period: int) -> dict[int, float]:
@@ -131,33 +155,18 @@ def calculate_missing_probabilities(survival_dict: dict[int, float], observation
         raise ValueError('Observation period must be at least 1 year.')
 
     sorted_years = sorted(survival_dict.keys())
-    full_range_years = range(sorted_years[0], observation_period + 1)
-    interpolated_dict: dict[int, float] = {}
-
-    for year in full_range_years:
-        if year in survival_dict:
-            interpolated_dict[year] = survival_dict[year]
-        else:
-            # Interpolate if within the range of provided years
-            if year < sorted_years[-1]:
-                lower_year = max([y for y in sorted_years if y < year])
-                upper_year = min([y for y in sorted_years if y > year])
-                # Linear interpolation
-                slope = (survival_dict[upper_year] - survival_dict[lower_year]) / (upper_year - lower_year)
-                interpolated_dict[year] = survival_dict[lower_year] + slope * (year - lower_year)
-            # Extrapolate if beyond the range of provided years
-            else:
-                if len(sorted_years) >= 2:
-                    # Use last two years for slope
-                    last_year = sorted_years[-1]
-                    second_last_year = sorted_years[-2]
-                    slope = (survival_dict[last_year] - survival_dict[second_last_year]) / (
-                        last_year - second_last_year
-                    )
-                    extrapolated_value = survival_dict[last_year] + slope * (year - last_year)
-                    interpolated_dict[year] = extrapolated_value
-                else:
-                    # Cannot extrapolate with less than 2 data points; use the last known value
-                    interpolated_dict[year] = survival_dict[sorted_years[-1]]
-
-    return interpolated_dict
+    years = np.asarray(sorted_years, dtype=np.float64)
+    probabilities = np.asarray([survival_dict[year] for year in sorted_years], dtype=np.float64)
+    full_range_years = np.arange(sorted_years[0], observation_period + 1)
+
+    # Linear interpolation within the range of provided years; np.interp holds the last known value beyond it
+    interpolated = np.interp(full_range_years, years, probabilities)
+
+    # Extrapolate beyond the range of provided years using the slope of the last two years.
+    # With less than 2 data points we cannot extrapolate and keep the last known value.
+    if len(sorted_years) >= 2:
+        beyond = full_range_years > years[-1]
+        slope = (probabilities[-1] - probabilities[-2]) / (years[-1] - years[-2])
+        interpolated[beyond] = probabilities[-1] + slope * (full_range_years[beyond] - years[-1])
+
+    return dict(zip(full_range_years.tolist(), interpolated.tolist(), strict=True))